@@ -1,47 +1,138 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Header
 from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.database import get_db
+from app.core.idempotency import idempotency_store
+from app.core.single_flight import report_flights
 from app.services.admin_service import AdminService
-from app.schemas.timesheet_schemas import AdminActionRequest
-from datetime import date
-from typing import List
+from app.services.timesheet_service import TimesheetService
+from app.schemas.timesheet_schemas import AdminActionRequest, TimesheetChangesResponse
+from datetime import date, timedelta
+from typing import List, Optional
 import io
 import pandas as pd
 
 router = APIRouter()
 
+# Mon-Fri, matching the days the employee dashboard offers for each week
+WORKING_DAYS_PER_WEEK = 5
+ANALYTICS_COLUMNS = [
+    "email", "name", "employee_id", "week_start_date",
+    "billable_hours", "holiday_hours", "days_logged", "capped_days"
+]
+
+REPORT_MODES = ("detail", "summary")
+SUMMARY_SHEETS = {
+    "employees": ("Employee_Totals", ["employee_id", "employee_name", "email", "weeks", "entries", "total_hours"]),
+    "weeks": ("Weekly_Totals", ["week_start_date", "employees", "entries", "total_hours"]),
+    "statuses": ("Status_Breakdown", ["status", "employees", "entries", "total_hours"])
+}
+
 @router.get("/submitted-weeks")
 async def get_submitted_weeks(db: AsyncSession = Depends(get_db)):
     weeks = await AdminService.get_submitted_weeks(db)
     # Convert result to a cleaner dictionary list
     return [{"email": w[0], "week_start_date": w[1], "name": w[2], "employee_id": w[3]} for w in weeks]
 
+@router.get("/changes", response_model=TimesheetChangesResponse)
+async def get_changes(since: Optional[str] = None, from_date: date = None, to_date: date = None, db: AsyncSession = Depends(get_db)):
+    return await TimesheetService.get_changes(db, since, None, from_date, to_date)
+
 @router.post("/approve")
-async def approve_week(data: AdminActionRequest, admin_email: str = "admin@system.com", db: AsyncSession = Depends(get_db)):
-    success = await AdminService.approve_week(db, data.email, data.week_start_date, admin_email)
-    if success:
-        return {"message": "Timesheet approved successfully"}
-    raise HTTPException(status_code=400, detail="Approval failed")
+async def approve_week(data: AdminActionRequest, admin_email: str = "admin@system.com", idempotency_key: Optional[str] = Header(None), db: AsyncSession = Depends(get_db)):
+    async def approve():
+        success = await AdminService.approve_week(db, data.email, data.week_start_date, admin_email)
+        if success:
+            return {"message": "Timesheet approved successfully"}
+        raise HTTPException(status_code=400, detail="Approval failed")
+    return await idempotency_store.run(
+        "admin/approve", idempotency_key,
+        f"{data.email}|{data.week_start_date}|{admin_email}",
+        approve
+    )
 
 @router.post("/reject")
-async def reject_week(data: AdminActionRequest, admin_email: str = "admin@system.com", db: AsyncSession = Depends(get_db)):
+async def reject_week(data: AdminActionRequest, admin_email: str = "admin@system.com", idempotency_key: Optional[str] = Header(None), db: AsyncSession = Depends(get_db)):
     if not data.reason:
         raise HTTPException(status_code=400, detail="Rejection reason required")
     
-    success = await AdminService.reject_week(db, data.email, data.week_start_date, data.reason, admin_email)
-    if success:
-        return {"message": "Timesheet rejected successfully"}
-    raise HTTPException(status_code=400, detail="Rejection failed")
+    async def reject():
+        success = await AdminService.reject_week(db, data.email, data.week_start_date, data.reason, admin_email)
+        if success:
+            return {"message": "Timesheet rejected successfully"}
+        raise HTTPException(status_code=400, detail="Rejection failed")
+    return await idempotency_store.run(
+        "admin/reject", idempotency_key,
+        f"{data.email}|{data.week_start_date}|{admin_email}|{data.reason}",
+        reject
+    )
 
 @router.get("/stats")
 async def get_stats(from_date: date = None, to_date: date = None, db: AsyncSession = Depends(get_db)):
     return await AdminService.get_stats(db, from_date, to_date)
     
+@router.get("/analytics")
+async def get_analytics(status: str = None, from_date: date = None, to_date: date = None, db: AsyncSession = Depends(get_db)):
+    result = await AdminService.get_analytics(db, from_date, to_date, status)
+    logged = pd.DataFrame([tuple(r) for r in result["weeks"]], columns=ANALYTICS_COLUMNS)
+
+    # Build the full employee x week grid so weeks with no entries at all show
+    # up as fully missing. Weeks start on Sunday; generated weeks stop at the
+    # last completed one so the current week is not reported as a gap.
+    people = pd.concat([
+        pd.DataFrame([tuple(r) for r in result["employees"]], columns=["email", "name", "employee_id"]),
+        logged[["email", "name", "employee_id"]]
+    ]).drop_duplicates("email")
+    week_set = set(logged["week_start_date"])
+    start = from_date or (min(week_set) if week_set else None)
+    if start:
+        start = start + timedelta(days=(6 - start.weekday()) % 7)
+        last_completed = date.today() - timedelta(days=7)
+        end = min(to_date, last_completed) if to_date else last_completed
+        week_set.update(d.date() for d in pd.date_range(start, end, freq="W-SUN"))
+    grid = people.merge(pd.DataFrame({"week_start_date": pd.Series(sorted(week_set), dtype=object)}), how="cross")
+
+    weeks = grid.merge(
+        logged.drop(columns=["name", "employee_id"]),
+        on=["email", "week_start_date"], how="left"
+    ).fillna({"billable_hours": 0.0, "holiday_hours": 0.0, "days_logged": 0, "capped_days": 0})
+    weeks = weeks.astype({
+        "billable_hours": float, "holiday_hours": float,
+        "days_logged": int, "capped_days": int
+    })
+    weeks["total_hours"] = weeks["billable_hours"] + weeks["holiday_hours"]
+    weeks["missing_days"] = (WORKING_DAYS_PER_WEEK - weeks["days_logged"]).clip(lower=0)
+    weeks["utilization"] = (weeks["billable_hours"] / weeks["total_hours"].where(weeks["total_hours"] > 0)).fillna(0.0)
+
+    employees = weeks.groupby(["email", "name", "employee_id"], as_index=False).agg(
+        weeks=("week_start_date", "count"),
+        billable_hours=("billable_hours", "sum"),
+        holiday_hours=("holiday_hours", "sum"),
+        total_hours=("total_hours", "sum"),
+        capped_days=("capped_days", "sum"),
+        missing_days=("missing_days", "sum")
+    )
+    employees["utilization"] = (employees["billable_hours"] / employees["total_hours"].where(employees["total_hours"] > 0)).fillna(0.0)
+
+    hour_cols = ["billable_hours", "holiday_hours", "total_hours"]
+    weeks[hour_cols] = weeks[hour_cols].round(1)
+    employees[hour_cols] = employees[hour_cols].round(1)
+    weeks["utilization"] = weeks["utilization"].round(3)
+    employees["utilization"] = employees["utilization"].round(3)
+
+    # Columnar payload: one list per field keeps the response compact
+    return {
+        "employees": employees.to_dict(orient="list"),
+        "weeks": weeks.to_dict(orient="list")
+    }
+
 @router.get("/reports/stats")
 async def get_reports_stats(from_date: date = None, to_date: date = None, db: AsyncSession = Depends(get_db)):
     try:
-        return await AdminService.get_report_stats(db, from_date, to_date)
+        return await report_flights.run(
+            ("reports/stats", None, from_date, to_date),
+            lambda: AdminService.get_report_stats(db, from_date, to_date)
+        )
     except HTTPException as e:
         raise e
     except Exception as e:
@@ -49,10 +140,18 @@ async def get_reports_stats(from_date: date = None, to_date: date = None, db: As
         logging.error(f"REPORTS STATS ERROR: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/reports/coalescing")
+async def get_report_coalescing_stats():
+    # Counts of report queries run versus requests that shared an in-flight query
+    return report_flights.stats()
+
 @router.get("/reports/filtered")
 async def get_filtered_reports(status: str = "Approved", from_date: date = None, to_date: date = None, db: AsyncSession = Depends(get_db)):
     try:
-        rows = await AdminService.get_report_list(db, from_date, to_date, status)
+        rows = await report_flights.run(
+            ("reports/filtered", status, from_date, to_date),
+            lambda: AdminService.get_report_list(db, from_date, to_date, status)
+        )
         return [
             {
                 "email": r[0],
@@ -72,9 +171,15 @@ async def get_filtered_reports(status: str = "Approved", from_date: date = None,
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/reports/download")
-async def download_report(status: str = "Approved", from_date: date = None, to_date: date = None, db: AsyncSession = Depends(get_db)):
+async def download_report(status: str = "Approved", from_date: date = None, to_date: date = None, mode: str = "detail", db: AsyncSession = Depends(get_db)):
     try:
-        results = await AdminService.get_detailed_report_data(db, from_date, to_date, status)
+        if mode not in REPORT_MODES:
+            raise HTTPException(status_code=400, detail=f"Invalid report mode. Use one of: {', '.join(REPORT_MODES)}")
+
+        results = await report_flights.run(
+            ("reports/download", status, from_date, to_date),
+            lambda: AdminService.get_detailed_report_data(db, from_date, to_date, status)
+        )
         
         if not results:
             raise HTTPException(status_code=404, detail="No data available for the selected period")
@@ -106,14 +211,25 @@ async def download_report(status: str = "Approved", from_date: date = None, to_d
 
         df = pd.DataFrame(data_list)
 
+        # Summary sheets are aggregated in the database, never from the detail rows
+        summaries = None
+        if mode == "summary":
+            summaries = await AdminService.get_report_summaries(db, from_date, to_date, status)
+
         # Create Excel in memory
         output = io.BytesIO()
         with pd.ExcelWriter(output, engine='openpyxl') as writer:
             df.to_excel(writer, index=False, sheet_name='Database_Export')
+            if summaries:
+                for key, (sheet_name, columns) in SUMMARY_SHEETS.items():
+                    summary_df = pd.DataFrame([tuple(r) for r in summaries[key]], columns=columns)
+                    summary_df["total_hours"] = summary_df["total_hours"].astype(float).round(1)
+                    summary_df.to_excel(writer, index=False, sheet_name=sheet_name)
         
         output.seek(0)
         
-        filename = f"DB_Export_{status}_{from_date}.xlsx"
+        prefix = "DB_Summary" if mode == "summary" else "DB_Export"
+        filename = f"{prefix}_{status}_{from_date}.xlsx"
         
         return StreamingResponse(
             output,
@@ -1,9 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Header
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.database import get_db
+from app.core.idempotency import idempotency_store
 from app.services.timesheet_service import TimesheetService
-from app.schemas.timesheet_schemas import TimesheetCreateRequest, TimesheetResponse
-from typing import List
+from app.schemas.timesheet_schemas import TimesheetCreateRequest, TimesheetResponse, TimesheetChangesResponse
+from datetime import date
+from typing import List, Optional
 
 router = APIRouter(prefix="/timesheets", tags=["timesheets"])
 
@@ -12,9 +14,14 @@ async def save_timesheet(
     data: TimesheetCreateRequest, 
     email: str,
     status: str = "Pending",
+    idempotency_key: Optional[str] = Header(None),
     db: AsyncSession = Depends(get_db)
 ):
-    return await TimesheetService.create_pending_entries(db, email, data, status)
+    return await idempotency_store.run(
+        "timesheets/save", idempotency_key,
+        f"{email}|{status}|{data.model_dump_json()}",
+        lambda: TimesheetService.create_pending_entries(db, email, data, status)
+    )
 
 @router.get("/week", response_model=List[TimesheetResponse])
 async def get_timesheet_by_week(
@@ -23,3 +30,13 @@ async def get_timesheet_by_week(
     db: AsyncSession = Depends(get_db)
 ):
     return await TimesheetService.get_entries_by_week(db, email, week_start_date)
+
+@router.get("/changes", response_model=TimesheetChangesResponse)
+async def get_timesheet_changes(
+    email: str,
+    since: Optional[str] = None,
+    from_date: date = None,
+    to_date: date = None,
+    db: AsyncSession = Depends(get_db)
+):
+    return await TimesheetService.get_changes(db, since, email, from_date, to_date)
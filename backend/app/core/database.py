@@ -1,14 +1,23 @@
 import os
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import declarative_base
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from dotenv import load_dotenv
 
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
+IS_SQLITE = bool(DATABASE_URL) and DATABASE_URL.startswith("sqlite")
+
+# Embedded single-node mode, e.g. DATABASE_URL=sqlite:///./timesheets.db
+if IS_SQLITE:
+    if DATABASE_URL.startswith("sqlite://"):
+        DATABASE_URL = DATABASE_URL.replace("sqlite://", "sqlite+aiosqlite://", 1)
 
 # Ensure the URL uses the asyncpg driver and lacks incompatible sslmode params
-if DATABASE_URL:
+elif DATABASE_URL:
     if DATABASE_URL.startswith("postgresql://"):
         DATABASE_URL = DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://", 1)
     
@@ -26,7 +35,20 @@ if DATABASE_URL:
 engine = None
 AsyncSessionLocal = None
 
-if DATABASE_URL:
+if IS_SQLITE:
+    print(f"DEBUG: Initializing embedded SQLite engine for {DATABASE_URL}")
+    engine = create_async_engine(DATABASE_URL, echo=False)
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        # WAL lets readers proceed while a write is in progress
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.close()
+
+    AsyncSessionLocal = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+elif DATABASE_URL:
     masked_url = DATABASE_URL.split("@")[-1] if "@" in DATABASE_URL else "configured"
     print(f"DEBUG: Initializing Database Engine for {masked_url}")
     engine = create_async_engine(
@@ -51,3 +73,20 @@ async def get_db():
             yield session
         finally:
             await session.close()
+
+def upsert(db: AsyncSession, model, values: dict, conflict_columns: list):
+    """Builds an INSERT ... ON CONFLICT DO UPDATE for the session's dialect.
+
+    Every column in values other than the conflict columns is overwritten on conflict.
+    """
+    insert_fn = sqlite_insert if db.bind.dialect.name == "sqlite" else pg_insert
+    stmt = insert_fn(model).values(**values)
+    return stmt.on_conflict_do_update(
+        index_elements=conflict_columns,
+        set_={k: stmt.excluded[k] for k in values if k not in conflict_columns}
+    )
+
+def insert_ignore(db: AsyncSession, model, conflict_columns: list):
+    """Builds an INSERT ... ON CONFLICT DO NOTHING for the session's dialect."""
+    insert_fn = sqlite_insert if db.bind.dialect.name == "sqlite" else pg_insert
+    return insert_fn(model).on_conflict_do_nothing(index_elements=conflict_columns)
@@ -0,0 +1,68 @@
+from fastapi import HTTPException
+import asyncio
+import hashlib
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+class IdempotencyStore:
+    """Short-lived, in-process store of responses keyed by Idempotency-Key.
+
+    A retry that arrives while the original request is still running waits for
+    it and receives the same result. Failed requests are not remembered, so
+    they can be retried. Each key is bound to a fingerprint of the caller and
+    payload; reusing it for a different request is rejected, never replayed.
+    """
+
+    def __init__(self, ttl_seconds: float = 600, max_entries: int = 10000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: Dict[Tuple[str, str], Tuple[float, str, asyncio.Future]] = {}
+
+    def _evict(self, now: float):
+        expired = [k for k, (expires_at, _, _) in self._entries.items() if expires_at <= now]
+        for k in expired:
+            del self._entries[k]
+        # Oldest entries go first once the store is full (dicts keep insertion order)
+        while len(self._entries) >= self.max_entries:
+            del self._entries[next(iter(self._entries))]
+
+    async def run(self, scope: str, key: Optional[str], fingerprint: str, func: Callable[[], Awaitable[Any]]) -> Any:
+        if not key:
+            return await func()
+
+        digest = hashlib.sha256(fingerprint.encode()).hexdigest()
+        while True:
+            now = time.monotonic()
+            entry = self._entries.get((scope, key))
+            if not entry or entry[0] <= now:
+                break
+            if entry[1] != digest:
+                raise HTTPException(status_code=422, detail="Idempotency-Key was already used for a different request")
+            try:
+                return await asyncio.shield(entry[2])
+            except asyncio.CancelledError:
+                # Only our own cancellation propagates; if the original request
+                # was cancelled, loop and run the work ourselves
+                if not entry[2].cancelled():
+                    raise
+
+        self._evict(now)
+        future = asyncio.get_running_loop().create_future()
+        self._entries[(scope, key)] = (now + self.ttl_seconds, digest, future)
+        try:
+            result = await func()
+        except Exception as e:
+            self._entries.pop((scope, key), None)
+            future.set_exception(e)
+            # Retrieve it so an unawaited future does not log a warning
+            future.exception()
+            raise
+        except BaseException:
+            # Cancelling the future tells waiters to retry, not to fail
+            self._entries.pop((scope, key), None)
+            future.cancel()
+            raise
+        future.set_result(result)
+        return result
+
+idempotency_store = IdempotencyStore()
@@ -3,7 +3,9 @@ from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 import logging
+from sqlalchemy import text
 from app.core.database import engine, Base
+from app.services.audit_service import audit_log
 from app.api.routes import auth, timesheets
 from app.api.endpoints import admin
 
@@ -14,12 +16,42 @@ async def lifespan(app: FastAPI):
         try:
             async with engine.begin() as conn:
                 await conn.run_sync(Base.metadata.create_all)
+                # create_all skips indexes on tables that already exist; delta
+                # sync filters pending_timesheets by updated_at
+                await conn.execute(text(
+                    "CREATE INDEX IF NOT EXISTS ix_pending_timesheets_updated_at "
+                    "ON pending_timesheets (updated_at)"
+                ))
             logging.info("Database tables created or verified.")
         except Exception as e:
             logging.warning(f"Database initialization delayed: {e}. Backend will retry on request.")
+        if engine.dialect.name == "postgresql":
+            # create_all does not add constraints to tables that already exist;
+            # approval upserts need the (email, week) unique key. Older
+            # deployments may hold duplicate approvals, so keep only the latest
+            # per week before adding it. Without the key every approval would
+            # fail, so refuse to start instead of running degraded.
+            try:
+                async with engine.begin() as conn:
+                    await conn.execute(text(
+                        "DELETE FROM approved_timesheets a USING approved_timesheets b "
+                        "WHERE a.email = b.email AND a.week_start_date = b.week_start_date "
+                        "AND (COALESCE(a.approval_timestamp, '-infinity'), a.timesheet_id) "
+                        "< (COALESCE(b.approval_timestamp, '-infinity'), b.timesheet_id)"
+                    ))
+                    await conn.execute(text(
+                        "CREATE UNIQUE INDEX IF NOT EXISTS uq_approved_timesheets_email_week "
+                        "ON approved_timesheets (email, week_start_date)"
+                    ))
+            except Exception as e:
+                logging.critical(f"Could not add unique week key to approved_timesheets: {e}")
+                raise RuntimeError("approved_timesheets unique week key is missing; approvals cannot run") from e
     else:
         logging.error("DATABASE_URL not set. Skipping table creation.")
+    await audit_log.start()
     yield
+    # Flush buffered audit events before the worker exits
+    await audit_log.stop()
 
 app = FastAPI(title="Employee Timesheet Manager API", lifespan=lifespan)
 logging.basicConfig(level=logging.INFO)
@@ -64,7 +96,6 @@ async def health():
             content={"status": "error", "detail": "DATABASE_URL not configured"}
         )
     try:
-        from sqlalchemy import text
         async with engine.connect() as conn:
             await conn.execute(text("SELECT 1"))
         return {"status": "ok", "database": "connected"}
@@ -1,7 +1,12 @@
-from sqlalchemy import Column, String, Integer, Float, Date, DateTime, ForeignKey, Enum
+from sqlalchemy import Column, String, Integer, Float, Date, DateTime, ForeignKey, Enum, UniqueConstraint
 from sqlalchemy.sql import func
 from app.core.database import Base
 import enum
+import uuid
+
+def generate_uuid() -> str:
+    # Client-side so the models work on databases without gen_random_uuid()
+    return str(uuid.uuid4())
 
 class WorkType(str, enum.Enum):
     BILLABLE = "Billable"
@@ -20,7 +25,7 @@ class Employee(Base):
 class PendingTimesheet(Base):
     __tablename__ = "pending_timesheets"
 
-    entry_id = Column(String, primary_key=True, index=True, server_default=func.gen_random_uuid())
+    entry_id = Column(String, primary_key=True, index=True, default=generate_uuid)
     email = Column(String, index=True, nullable=False)
     week_start_date = Column(Date, nullable=False)
     date = Column(Date, nullable=False)
@@ -30,12 +35,13 @@ class PendingTimesheet(Base):
     rejection_reason = Column(String, nullable=True) # Feedback from admin
     work_type = Column(Enum(WorkType), nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), index=True)
 
 class ApprovedTimesheet(Base):
     __tablename__ = "approved_timesheets"
+    __table_args__ = (UniqueConstraint("email", "week_start_date", name="uq_approved_timesheets_email_week"),)
 
-    timesheet_id = Column(String, primary_key=True, index=True, server_default=func.gen_random_uuid())
+    timesheet_id = Column(String, primary_key=True, index=True, default=generate_uuid)
     email = Column(String, index=True, nullable=False)
     week_start_date = Column(Date, nullable=False)
     total_hours = Column(Float, nullable=False)
@@ -45,9 +51,32 @@ class ApprovedTimesheet(Base):
 class DeniedTimesheet(Base):
     __tablename__ = "denied_timesheets"
 
-    timesheet_id = Column(String, primary_key=True, index=True, server_default=func.gen_random_uuid())
+    timesheet_id = Column(String, primary_key=True, index=True, default=generate_uuid)
     email = Column(String, index=True, nullable=False)
     week_start_date = Column(Date, nullable=False)
     rejection_reason = Column(String, nullable=False)
     denied_at = Column(DateTime(timezone=True), server_default=func.now())
     denied_by = Column(String, nullable=False)
+
+class DeletedTimesheetEntry(Base):
+    __tablename__ = "deleted_timesheet_entries"
+
+    # Tombstones for rows removed from pending_timesheets, consumed by delta sync
+    entry_id = Column(String, primary_key=True, index=True)
+    email = Column(String, index=True, nullable=False)
+    week_start_date = Column(Date, nullable=False)
+    deleted_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+
+class TimesheetEvent(Base):
+    __tablename__ = "timesheet_events"
+
+    # Append-only audit trail; ids and timestamps are set when the event is
+    # recorded, not when the buffered batch is flushed
+    event_id = Column(String, primary_key=True, index=True)
+    event_type = Column(String, index=True, nullable=False) # 'Save', 'Submit', 'Approve', 'Reject'
+    email = Column(String, index=True, nullable=False)
+    week_start_date = Column(Date, nullable=False)
+    actor = Column(String, nullable=False)
+    total_hours = Column(Float, nullable=True)
+    detail = Column(String, nullable=True)
+    occurred_at = Column(DateTime(timezone=True), nullable=False, index=True)
@@ -1,11 +1,13 @@
 from pydantic import BaseModel, Field, field_validator
-from datetime import date as date_type
+from datetime import date as date_type, datetime
 from typing import List, Optional
 from app.models.models import WorkType
 
+MAX_DAILY_HOURS = 8
+
 class TimesheetEntryBase(BaseModel):
     date: date_type
-    hours: float = Field(..., ge=0, le=8)
+    hours: float = Field(..., ge=0, le=MAX_DAILY_HOURS)
     task_description: str
     work_type: WorkType
 
@@ -19,8 +21,8 @@ class TimesheetCreateRequest(BaseModel):
         totals = {}
         for entry in v:
             totals[entry.date] = totals.get(entry.date, 0) + entry.hours
-            if totals[entry.date] > 8:
-                raise ValueError(f"Total hours for {entry.date} cannot exceed 8 hours")
+            if totals[entry.date] > MAX_DAILY_HOURS:
+                raise ValueError(f"Total hours for {entry.date} cannot exceed {MAX_DAILY_HOURS} hours")
         return v
 
 class TimesheetResponse(BaseModel):
@@ -36,6 +38,24 @@ class TimesheetResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class TimesheetChangeEntry(TimesheetResponse):
+    week_start_date: date_type
+    updated_at: Optional[datetime] = None
+
+class TimesheetTombstone(BaseModel):
+    entry_id: str
+    email: str
+    week_start_date: date_type
+    deleted_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+class TimesheetChangesResponse(BaseModel):
+    next_token: str
+    changed: List[TimesheetChangeEntry]
+    deleted: List[TimesheetTombstone]
+
 class AdminActionRequest(BaseModel):
     email: str
     week_start_date: date_type
@@ -1,10 +1,12 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update, delete
+from sqlalchemy import select, update, delete, case, extract
 from sqlalchemy.sql import func
-from app.models.models import PendingTimesheet, ApprovedTimesheet, DeniedTimesheet, Employee
+from app.core.database import upsert
+from app.models.models import PendingTimesheet, ApprovedTimesheet, DeniedTimesheet, Employee, WorkType
+from app.schemas.timesheet_schemas import MAX_DAILY_HOURS
+from app.services.audit_service import audit_log
 from datetime import date
 from typing import List
-import uuid
 
 import logging
 from fastapi import HTTPException
@@ -29,6 +31,16 @@ class AdminService:
             logging.error(f"Error fetching submitted weeks: {str(e)}")
             raise HTTPException(status_code=500, detail="Error fetching submitted data")
 
+    @staticmethod
+    async def _week_has_status(db: AsyncSession, email: str, week_start_date: date, status: str) -> bool:
+        """Checks whether any entry of the given week already carries the status."""
+        stmt = select(PendingTimesheet.entry_id).where(
+            PendingTimesheet.email == email,
+            PendingTimesheet.week_start_date == week_start_date,
+            PendingTimesheet.status == status
+        ).limit(1)
+        return (await db.execute(stmt)).first() is not None
+
     @staticmethod
     async def approve_week(db: AsyncSession, email: str, week_start_date: date, admin_email: str):
         """Approves all entries for a given week and user."""
@@ -40,7 +52,12 @@ class AdminService:
                 PendingTimesheet.status == "Submitted"
             ).values(status="Approved", rejection_reason=None)
             
-            await db.execute(stmt)
+            result = await db.execute(stmt)
+            if result.rowcount == 0:
+                # Nothing left to approve: a retry of an approved week succeeds,
+                # anything else (never submitted, still a draft, unknown user) fails
+                await db.rollback()
+                return await AdminService._week_has_status(db, email, week_start_date, "Approved")
             
             # 2. Record approval in ApprovedTimesheet summary
             # Calculate total hours
@@ -50,15 +67,19 @@ class AdminService:
             )
             total_hours = (await db.execute(hours_stmt)).scalar() or 0.0
             
-            approval = ApprovedTimesheet(
-                timesheet_id=str(uuid.uuid4()),
-                email=email,
-                week_start_date=week_start_date,
-                total_hours=total_hours,
-                approved_by=admin_email
-            )
-            db.add(approval)
+            await db.execute(upsert(
+                db, ApprovedTimesheet,
+                {
+                    "email": email,
+                    "week_start_date": week_start_date,
+                    "total_hours": total_hours,
+                    "approved_by": admin_email,
+                    "approval_timestamp": func.now()
+                },
+                conflict_columns=["email", "week_start_date"]
+            ))
             await db.commit()
+            audit_log.record("Approve", email, week_start_date, admin_email, total_hours=total_hours)
             return True
         except Exception as e:
             await db.rollback()
@@ -76,11 +97,13 @@ class AdminService:
                 PendingTimesheet.status == "Submitted"
             ).values(status="Denied", rejection_reason=reason)
             
-            await db.execute(stmt)
+            result = await db.execute(stmt)
+            if result.rowcount == 0:
+                await db.rollback()
+                return await AdminService._week_has_status(db, email, week_start_date, "Denied")
             
             # Log to Denied history
             denial = DeniedTimesheet(
-                timesheet_id=str(uuid.uuid4()),
                 email=email,
                 week_start_date=week_start_date,
                 rejection_reason=reason,
@@ -88,6 +111,7 @@ class AdminService:
             )
             db.add(denial)
             await db.commit()
+            audit_log.record("Reject", email, week_start_date, admin_email, detail=reason)
             return True
         except Exception as e:
             await db.rollback()
@@ -139,17 +163,21 @@ class AdminService:
             # Pending and Rejected are usually global or based on current state, 
             # but we can filter them by week_start_date too if needed.
             # Keeping pending/rejected relative to the same period for report consistency.
-            pending_count_stmt = select(func.count(func.distinct(PendingTimesheet.email, PendingTimesheet.week_start_date)))\
+            # Count distinct (email, week) pairs through a subquery; multi-column
+            # COUNT(DISTINCT ...) is not portable across databases
+            pending_weeks_stmt = select(PendingTimesheet.email, PendingTimesheet.week_start_date)\
                 .where(PendingTimesheet.status == "Submitted")
             rejected_count_stmt = select(func.count(DeniedTimesheet.timesheet_id))
             
             if from_date:
-                pending_count_stmt = pending_count_stmt.where(PendingTimesheet.week_start_date >= from_date)
+                pending_weeks_stmt = pending_weeks_stmt.where(PendingTimesheet.week_start_date >= from_date)
                 rejected_count_stmt = rejected_count_stmt.where(DeniedTimesheet.week_start_date >= from_date)
             if to_date:
-                pending_count_stmt = pending_count_stmt.where(PendingTimesheet.week_start_date <= to_date)
+                pending_weeks_stmt = pending_weeks_stmt.where(PendingTimesheet.week_start_date <= to_date)
                 rejected_count_stmt = rejected_count_stmt.where(DeniedTimesheet.week_start_date <= to_date)
 
+            pending_count_stmt = select(func.count()).select_from(pending_weeks_stmt.distinct().subquery())
+
             pending_count = (await db.execute(pending_count_stmt)).scalar() or 0
             rejected_count = (await db.execute(rejected_count_stmt)).scalar() or 0
             
@@ -269,3 +297,125 @@ class AdminService:
         except Exception as e:
             logging.error(f"Error in detailed report data: {str(e)}")
             raise HTTPException(status_code=500, detail="Error fetching export data")
+
+    @staticmethod
+    async def get_report_summaries(db: AsyncSession, from_date: date, to_date: date, status: str):
+        """Returns per-employee, per-week and per-status aggregates for the summary workbook."""
+        try:
+            status_map = {
+                "Approved": "Approved",
+                "Pending": "Submitted",
+                "Rejected": "Denied"
+            }
+            db_status = status_map.get(status, "Approved")
+
+            def in_range(stmt):
+                if from_date:
+                    stmt = stmt.where(PendingTimesheet.week_start_date >= from_date)
+                if to_date:
+                    stmt = stmt.where(PendingTimesheet.week_start_date <= to_date)
+                return stmt
+
+            employee_stmt = in_range(select(
+                Employee.employee_id,
+                Employee.name,
+                PendingTimesheet.email,
+                func.count(func.distinct(PendingTimesheet.week_start_date)),
+                func.count(PendingTimesheet.entry_id),
+                func.sum(PendingTimesheet.hours)
+            ).join(Employee, Employee.email == PendingTimesheet.email)\
+             .where(PendingTimesheet.status == db_status))\
+             .group_by(Employee.employee_id, Employee.name, PendingTimesheet.email)\
+             .order_by(Employee.name)
+
+            week_stmt = in_range(select(
+                PendingTimesheet.week_start_date,
+                func.count(func.distinct(PendingTimesheet.email)),
+                func.count(PendingTimesheet.entry_id),
+                func.sum(PendingTimesheet.hours)
+            ).where(PendingTimesheet.status == db_status))\
+             .group_by(PendingTimesheet.week_start_date)\
+             .order_by(PendingTimesheet.week_start_date)
+
+            # The status breakdown deliberately spans every status in the period
+            status_stmt = in_range(select(
+                PendingTimesheet.status,
+                func.count(func.distinct(PendingTimesheet.email)),
+                func.count(PendingTimesheet.entry_id),
+                func.sum(PendingTimesheet.hours)
+            )).group_by(PendingTimesheet.status)\
+              .order_by(PendingTimesheet.status)
+
+            return {
+                "employees": (await db.execute(employee_stmt)).all(),
+                "weeks": (await db.execute(week_stmt)).all(),
+                "statuses": (await db.execute(status_stmt)).all()
+            }
+        except Exception as e:
+            logging.error(f"Error in report summaries: {str(e)}")
+            raise HTTPException(status_code=500, detail="Error fetching report summaries")
+
+    @staticmethod
+    async def get_analytics(db: AsyncSession, from_date: date = None, to_date: date = None, status: str = None):
+        """Returns per-employee, per-week utilization aggregates computed in the database.
+
+        Each week row carries billable and holiday hours, the number of weekdays
+        logged and the number of days that reached the daily hour cap. The list of
+        employees lets callers fill in weeks with no entries at all.
+        """
+        try:
+            status_map = {
+                "Approved": "Approved",
+                "Pending": "Submitted",
+                "Rejected": "Denied"
+            }
+
+            # Collapse entries to one row per employee-day first, so the cap check
+            # applies to daily totals rather than individual entries
+            daily = select(
+                PendingTimesheet.email.label("email"),
+                PendingTimesheet.week_start_date.label("week_start_date"),
+                PendingTimesheet.date.label("date"),
+                func.sum(PendingTimesheet.hours).label("day_hours"),
+                func.sum(case((PendingTimesheet.work_type == WorkType.BILLABLE, PendingTimesheet.hours), else_=0.0)).label("billable_hours"),
+                func.sum(case((PendingTimesheet.work_type == WorkType.HOLIDAY, PendingTimesheet.hours), else_=0.0)).label("holiday_hours"),
+                # Only Mon-Fri (dow 1-5) count towards days logged
+                func.max(case((extract("dow", PendingTimesheet.date).between(1, 5), 1), else_=0)).label("is_weekday")
+            )
+
+            if status:
+                daily = daily.where(PendingTimesheet.status == status_map.get(status, status))
+            if from_date:
+                daily = daily.where(PendingTimesheet.week_start_date >= from_date)
+            if to_date:
+                daily = daily.where(PendingTimesheet.week_start_date <= to_date)
+
+            daily = daily.group_by(
+                PendingTimesheet.email,
+                PendingTimesheet.week_start_date,
+                PendingTimesheet.date
+            ).subquery()
+
+            stmt = select(
+                daily.c.email,
+                Employee.name,
+                Employee.employee_id,
+                daily.c.week_start_date,
+                func.sum(daily.c.billable_hours),
+                func.sum(daily.c.holiday_hours),
+                func.sum(daily.c.is_weekday),
+                func.sum(case((daily.c.day_hours >= MAX_DAILY_HOURS, 1), else_=0))
+            ).join(Employee, Employee.email == daily.c.email)\
+             .group_by(daily.c.email, Employee.name, Employee.employee_id, daily.c.week_start_date)\
+             .order_by(daily.c.email, daily.c.week_start_date)
+
+            employees_stmt = select(Employee.email, Employee.name, Employee.employee_id)\
+                .where(Employee.role == "Employee")
+
+            return {
+                "weeks": (await db.execute(stmt)).all(),
+                "employees": (await db.execute(employees_stmt)).all()
+            }
+        except Exception as e:
+            logging.error(f"Error in analytics: {str(e)}")
+            raise HTTPException(status_code=500, detail="Error calculating analytics")
@@ -0,0 +1,111 @@
+from app.core.database import AsyncSessionLocal, insert_ignore
+from app.models.models import TimesheetEvent
+from datetime import date, datetime, timezone
+from typing import Optional
+import asyncio
+import uuid
+
+import logging
+
+class AuditLog:
+    """Buffers timesheet events in memory and writes them in batches from a background task."""
+
+    def __init__(self, max_queue_size: int = 10000, batch_size: int = 500, flush_interval: float = 2.0):
+        self.max_queue_size = max_queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self._closing = False
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def record(self, event_type: str, email: str, week_start_date: date, actor: str,
+               total_hours: float = None, detail: str = None):
+        """Queues an event without blocking; drops it if the buffer is full or the log is not running."""
+        if self._queue is None:
+            return
+        event = {
+            "event_id": str(uuid.uuid4()),
+            "event_type": event_type,
+            "email": email,
+            "week_start_date": week_start_date,
+            "actor": actor,
+            "total_hours": total_hours,
+            "detail": detail,
+            "occurred_at": datetime.now(timezone.utc)
+        }
+        try:
+            self._queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            logging.warning(f"Audit buffer full, dropped {event_type} event for {email} on {week_start_date}")
+
+    async def start(self):
+        if not AsyncSessionLocal or self._task:
+            return
+        self._closing = False
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stops the background writer and flushes everything still buffered."""
+        if not self._task:
+            return
+        # Let the writer finish its current batch rather than cancelling it mid-insert
+        self._closing = True
+        await self._task
+        self._task = None
+        while not self._queue.empty():
+            batch = self._drain([])
+            # One retry for a failed final flush, then the events are lost
+            if not await self._flush(batch) and not await self._flush(batch):
+                self.dropped += len(batch)
+                logging.error(f"Dropped {len(batch)} audit events at shutdown")
+        self._queue = None
+
+    def _requeue(self, batch: list):
+        """Puts a failed batch back for the next cycle, counting what no longer fits."""
+        for i, event in enumerate(batch):
+            try:
+                self._queue.put_nowait(event)
+            except asyncio.QueueFull:
+                lost = len(batch) - i
+                self.dropped += lost
+                logging.error(f"Audit buffer full, dropped {lost} events from a failed batch")
+                break
+
+    def _drain(self, batch: list) -> list:
+        while len(batch) < self.batch_size and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        return batch
+
+    async def _run(self):
+        while not self._closing:
+            # Wait for work, then give the batch a moment to fill up
+            try:
+                first = await asyncio.wait_for(self._queue.get(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                continue
+            if self._queue.qsize() < self.batch_size and not self._closing:
+                await asyncio.sleep(self.flush_interval)
+            batch = self._drain([first])
+            if not await self._flush(batch):
+                self._requeue(batch)
+                # Back off so a database outage is not hammered every cycle
+                await asyncio.sleep(self.flush_interval)
+
+    async def _flush(self, batch: list) -> bool:
+        if not batch:
+            return True
+        try:
+            async with AsyncSessionLocal() as session:
+                # Ignore ids already written so retrying a batch whose commit
+                # succeeded but was not acknowledged cannot fail forever
+                await session.execute(insert_ignore(session, TimesheetEvent, ["event_id"]), batch)
+                await session.commit()
+            return True
+        except Exception as e:
+            logging.error(f"Failed to write {len(batch)} audit events, will retry: {str(e)}")
+            return False
+
+audit_log = AuditLog()
@@ -1,19 +1,52 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.models.models import PendingTimesheet
+from app.models.models import PendingTimesheet, DeletedTimesheetEntry
 from app.schemas.timesheet_schemas import TimesheetCreateRequest
-from typing import List
+from app.services.audit_service import audit_log
+from typing import List, Optional
 import uuid
 
 import logging
-from sqlalchemy import delete, select
-from datetime import datetime
+from sqlalchemy import delete, insert, select
+from sqlalchemy.sql import func
+from datetime import date, datetime, timedelta, timezone
 from fastapi import HTTPException
 
+# Sync tokens lag the server clock slightly so rows from transactions that were
+# still in flight when the token was issued are re-sent rather than missed.
+SYNC_TOKEN_OVERLAP = timedelta(seconds=5)
+SYNC_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+# Tombstones are kept this long; older sync tokens must do a full resync.
+# Pruning waits an extra margin so app/DB clock skew cannot drop a tombstone
+# that a still-valid token needs.
+TOMBSTONE_RETENTION = timedelta(days=30)
+TOMBSTONE_PRUNE_MARGIN = timedelta(hours=1)
+
 class TimesheetService:
     @staticmethod
     async def create_pending_entries(db: AsyncSession, email: str, data: TimesheetCreateRequest, status: str = "Pending"):
         try:
-            # 1. Clean up existing entries for this week/user to avoid duplicates
+            # 1. Clean up existing entries for this week/user to avoid duplicates,
+            # leaving tombstones behind so delta sync clients can drop them
+            week_filter = select(
+                PendingTimesheet.entry_id,
+                PendingTimesheet.email,
+                PendingTimesheet.week_start_date
+            ).where(
+                PendingTimesheet.email == email,
+                PendingTimesheet.week_start_date == data.week_start_date
+            )
+            await db.execute(
+                insert(DeletedTimesheetEntry).from_select(
+                    ["entry_id", "email", "week_start_date"], week_filter
+                )
+            )
+
+            # Drop tombstones that no valid sync token can ask for any more
+            prune_before = datetime.now(timezone.utc) - TOMBSTONE_RETENTION - TOMBSTONE_PRUNE_MARGIN
+            await db.execute(
+                delete(DeletedTimesheetEntry).where(DeletedTimesheetEntry.deleted_at < prune_before)
+            )
+
             delete_stmt = delete(PendingTimesheet).where(
                 PendingTimesheet.email == email,
                 PendingTimesheet.week_start_date == data.week_start_date
@@ -37,6 +70,11 @@ class TimesheetService:
                 new_entries.append(db_entry)
             
             await db.commit()
+            audit_log.record(
+                "Submit" if status == "Submitted" else "Save",
+                email, data.week_start_date, email,
+                total_hours=sum(entry.hours for entry in data.entries)
+            )
             for entry in new_entries:
                 await db.refresh(entry)
             return new_entries
@@ -65,3 +103,70 @@ class TimesheetService:
         except Exception as e:
             logging.error(f"Error fetching timesheet for {email} on {week_start_date}: {str(e)}")
             raise HTTPException(status_code=500, detail="Error retrieving timesheet data")
+
+    @staticmethod
+    async def get_changes(db: AsyncSession, since: Optional[str] = None, email: Optional[str] = None,
+                          from_date: date = None, to_date: date = None):
+        """Returns entries changed and tombstones recorded since the given sync token.
+
+        Without a token every current entry in the week range is returned and no
+        tombstones. Pass email=None for an all-employee (admin) feed, which needs
+        from_date for its first full sync. Tokens older than the tombstone
+        retention window are rejected with 410 so the client resyncs.
+        """
+        try:
+            since_ts = None
+            if since:
+                # Tokens are opaque URL-safe strings: microseconds since the epoch
+                try:
+                    since_ts = SYNC_EPOCH + timedelta(microseconds=int(since))
+                except (ValueError, OverflowError):
+                    raise HTTPException(status_code=400, detail="Invalid sync token")
+            elif not email and not from_date:
+                raise HTTPException(status_code=400, detail="from_date is required for a full sync of all employees")
+
+            server_now = (await db.execute(select(func.now()))).scalar()
+            if server_now.tzinfo is None:
+                # SQLite reports CURRENT_TIMESTAMP as naive UTC
+                server_now = server_now.replace(tzinfo=timezone.utc)
+
+            if since_ts and since_ts < server_now - TOMBSTONE_RETENTION:
+                raise HTTPException(status_code=410, detail="Sync token expired. Perform a full resync without a token.")
+
+            changed_stmt = select(PendingTimesheet)
+            if email:
+                changed_stmt = changed_stmt.where(PendingTimesheet.email == email)
+            if from_date:
+                changed_stmt = changed_stmt.where(PendingTimesheet.week_start_date >= from_date)
+            if to_date:
+                changed_stmt = changed_stmt.where(PendingTimesheet.week_start_date <= to_date)
+            if since_ts:
+                changed_stmt = changed_stmt.where(PendingTimesheet.updated_at >= since_ts)
+            changed_stmt = changed_stmt.order_by(PendingTimesheet.updated_at)
+            changed = (await db.execute(changed_stmt)).scalars().all()
+
+            deleted = []
+            if since_ts:
+                deleted_stmt = select(DeletedTimesheetEntry)\
+                    .where(DeletedTimesheetEntry.deleted_at >= since_ts)
+                if email:
+                    deleted_stmt = deleted_stmt.where(DeletedTimesheetEntry.email == email)
+                if from_date:
+                    deleted_stmt = deleted_stmt.where(DeletedTimesheetEntry.week_start_date >= from_date)
+                if to_date:
+                    deleted_stmt = deleted_stmt.where(DeletedTimesheetEntry.week_start_date <= to_date)
+                deleted_stmt = deleted_stmt.order_by(DeletedTimesheetEntry.deleted_at)
+                deleted = (await db.execute(deleted_stmt)).scalars().all()
+
+            next_token = (server_now - SYNC_TOKEN_OVERLAP - SYNC_EPOCH) // timedelta(microseconds=1)
+
+            return {
+                "next_token": str(next_token),
+                "changed": changed,
+                "deleted": deleted
+            }
+        except HTTPException:
+            raise
+        except Exception as e:
+            logging.error(f"Error fetching timesheet changes since {since}: {str(e)}")
+            raise HTTPException(status_code=500, detail="Error retrieving timesheet changes")
@@ -0,0 +1,117 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from app.core.idempotency import IdempotencyStore
+
+@pytest.mark.asyncio
+async def test_replay_with_same_key_and_payload_returns_stored_response():
+    store = IdempotencyStore()
+    calls = 0
+
+    async def save():
+        nonlocal calls
+        calls += 1
+        return {"saved": calls}
+
+    first = await store.run("timesheets/save", "k1", "a@x.com|Pending|{}", save)
+    replay = await store.run("timesheets/save", "k1", "a@x.com|Pending|{}", save)
+
+    assert first == replay == {"saved": 1}
+    assert calls == 1
+
+@pytest.mark.asyncio
+async def test_reusing_key_with_different_payload_is_rejected():
+    store = IdempotencyStore()
+
+    async def save():
+        return "a's entries"
+
+    await store.run("timesheets/save", "k1", "a@x.com|Pending|{}", save)
+
+    with pytest.raises(HTTPException) as exc_info:
+        await store.run("timesheets/save", "k1", "b@x.com|Pending|{}", save)
+    assert exc_info.value.status_code == 422
+
+@pytest.mark.asyncio
+async def test_concurrent_retries_wait_for_the_original_request():
+    store = IdempotencyStore()
+    calls = 0
+
+    async def approve():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return {"message": "ok"}
+
+    results = await asyncio.gather(*[store.run("admin/approve", "k1", "fp", approve) for _ in range(3)])
+
+    assert results == [{"message": "ok"}] * 3
+    assert calls == 1
+
+@pytest.mark.asyncio
+async def test_exception_reaches_every_waiter_and_is_not_stored():
+    store = IdempotencyStore()
+    calls = 0
+
+    async def approve():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        if calls == 1:
+            raise HTTPException(status_code=500, detail="Failed to approve timesheet")
+        return {"message": "ok"}
+
+    results = await asyncio.gather(*[store.run("admin/approve", "k1", "fp", approve) for _ in range(3)], return_exceptions=True)
+    assert all(isinstance(r, HTTPException) and r.status_code == 500 for r in results)
+
+    # Failures are forgotten, so a later retry runs the work again
+    assert await store.run("admin/approve", "k1", "fp", approve) == {"message": "ok"}
+    assert calls == 2
+
+@pytest.mark.asyncio
+async def test_waiters_take_over_when_original_request_is_cancelled():
+    store = IdempotencyStore()
+    calls = 0
+
+    async def save():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return calls
+
+    original = asyncio.create_task(store.run("timesheets/save", "k1", "fp", save))
+    await asyncio.sleep(0.01)
+    retries = [asyncio.create_task(store.run("timesheets/save", "k1", "fp", save)) for _ in range(3)]
+    await asyncio.sleep(0.01)
+    original.cancel()
+
+    assert await asyncio.gather(*retries) == [2, 2, 2]
+    assert calls == 2
+
+@pytest.mark.asyncio
+async def test_requests_without_a_key_are_not_stored():
+    store = IdempotencyStore()
+    calls = 0
+
+    async def save():
+        nonlocal calls
+        calls += 1
+        return calls
+
+    assert await store.run("timesheets/save", None, "fp", save) == 1
+    assert await store.run("timesheets/save", None, "fp", save) == 2
+
+@pytest.mark.asyncio
+async def test_expired_entries_run_again():
+    store = IdempotencyStore(ttl_seconds=0)
+    calls = 0
+
+    async def save():
+        nonlocal calls
+        calls += 1
+        return calls
+
+    await store.run("timesheets/save", "k1", "fp", save)
+    assert await store.run("timesheets/save", "k1", "fp", save) == 2
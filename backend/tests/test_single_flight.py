@@ -0,0 +1,91 @@
+import asyncio
+
+import pytest
+
+from app.core.single_flight import SingleFlight
+
+@pytest.mark.asyncio
+async def test_concurrent_identical_calls_share_one_execution():
+    flights = SingleFlight()
+    calls = 0
+
+    async def query():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return "rows"
+
+    results = await asyncio.gather(*[flights.run(("reports/stats", None, None, None), query) for _ in range(5)])
+
+    assert results == ["rows"] * 5
+    assert calls == 1
+    assert flights.stats() == {"executed": 1, "coalesced": 4, "in_flight": 0}
+
+@pytest.mark.asyncio
+async def test_different_keys_are_not_coalesced():
+    flights = SingleFlight()
+
+    async def query():
+        await asyncio.sleep(0.01)
+        return 1
+
+    await asyncio.gather(flights.run("a", query), flights.run("b", query))
+
+    assert flights.stats()["executed"] == 2
+    assert flights.stats()["coalesced"] == 0
+
+@pytest.mark.asyncio
+async def test_exception_reaches_every_waiter():
+    flights = SingleFlight()
+
+    async def query():
+        await asyncio.sleep(0.05)
+        raise ValueError("query failed")
+
+    results = await asyncio.gather(*[flights.run("k", query) for _ in range(3)], return_exceptions=True)
+
+    assert all(isinstance(r, ValueError) for r in results)
+    assert flights.stats()["in_flight"] == 0
+
+@pytest.mark.asyncio
+async def test_waiters_take_over_when_leader_is_cancelled():
+    flights = SingleFlight()
+    calls = 0
+
+    async def query():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return calls
+
+    leader = asyncio.create_task(flights.run("k", query))
+    await asyncio.sleep(0.01)
+    waiters = [asyncio.create_task(flights.run("k", query)) for _ in range(3)]
+    await asyncio.sleep(0.01)
+    leader.cancel()
+
+    results = await asyncio.gather(*waiters)
+
+    # One waiter re-ran the query and the others shared its result
+    assert results == [2, 2, 2]
+    assert calls == 2
+    with pytest.raises(asyncio.CancelledError):
+        await leader
+
+@pytest.mark.asyncio
+async def test_cancelling_a_waiter_does_not_affect_the_leader():
+    flights = SingleFlight()
+
+    async def query():
+        await asyncio.sleep(0.05)
+        return "rows"
+
+    leader = asyncio.create_task(flights.run("k", query))
+    await asyncio.sleep(0.01)
+    waiter = asyncio.create_task(flights.run("k", query))
+    await asyncio.sleep(0.01)
+    waiter.cancel()
+
+    assert await leader == "rows"
+    with pytest.raises(asyncio.CancelledError):
+        await waiter